@@ -1,259 +1,215 @@
 import os
+import sys
 import json
-from bs4 import BeautifulSoup
-from typing import TypedDict, List, Optional
-from dotenv import load_dotenv
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Dict, Literal, Optional
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from langchain_groq import ChatGroq
-from langchain_core.messages import HumanMessage, SystemMessage
-from langgraph.graph import StateGraph, END
-import httpx
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
 
-# Load environment variables
-load_dotenv()
+# Make the shared assistant package importable when Vercel runs this file directly
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from assistant.cache import (
+    ANSWER_CACHE_SIZE,
+    ANSWER_CACHE_TTL,
+    SEMANTIC_CACHE_THRESHOLD,
+    SEMANTIC_CACHE_MAX_BYTES,
+    AnswerCache,
+    SemanticCache,
+    is_cacheable,
+    is_fresh,
+    normalize_query,
+)
+from assistant.complaints import complaint_node, ensure_complaint_worker, stop_complaint_worker
+from assistant.graph import GRAPH_MODE, GRAPH_MODES, build_graph
+from assistant.http_scraper import close_http_client, get_http_client
+from assistant.llm import token_metrics
+from assistant.snapshot import (
+    SNAPSHOT_PATH,
+    current_page_hashes,
+    ensure_snapshot_refresher,
+    get_current_snapshot,
+    load_snapshot,
+    refresh_snapshot,
+    schedule_snapshot_refresh,
+    set_current_snapshot,
+    snapshot_is_stale,
+    stop_snapshot_refresher,
+)
+from assistant.state import TARGET_URLS, AgentState, initial_state, pages_used, scraped_update
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    get_http_client()
+    ensure_complaint_worker()
+    ensure_snapshot_refresher(TARGET_URLS)
+    try:
+        yield
+    finally:
+        await stop_snapshot_refresher()
+        await stop_complaint_worker()
+        await close_http_client()
 
-# Initialize Groq LLM
-llm = ChatGroq(
-    temperature=0,
-    model_name="llama-3.3-70b-versatile",
-    groq_api_key=os.getenv("GROQ_API_KEY")
-)
+app = FastAPI(lifespan=lifespan)
 
-# Define the state for the graph
-class AgentState(TypedDict):
-    query: str
-    urls: List[str]
-    scraped_content: str
-    analysis: str
-    final_response: str
-    validation_status: str
-    email: Optional[str]
+# Start from the pre-built snapshot when there is one; the background refresher
+# keeps it up to date from then on
+set_current_snapshot(load_snapshot(SNAPSHOT_PATH))
 
 # Node 1: Scraper (Vercel-friendly)
+# Reads the in-memory snapshot and never waits on a scrape once content exists
 async def scraper_node(state: AgentState):
-    combined_text = ""
     urls = state['urls']
-    
-    async with httpx.AsyncClient(follow_redirects=True) as client:
-        for url in urls:
-            try:
-                response = await client.get(url, timeout=10.0)
-                if response.status_code == 200:
-                    soup = BeautifulSoup(response.text, "html.parser")
-                    
-                    # Remove irrelevant tags
-                    for tag in soup(["script", "style", "nav", "footer", "header", "svg"]):
-                        tag.extract()
-                        
-                    text = soup.get_text(separator=' ')
-                    lines = (line.strip() for line in text.splitlines())
-                    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-                    clean_text = '\n'.join(chunk for chunk in chunks if chunk)
-                    
-                    combined_text += f"\n--- Content from {url} ---\n{clean_text}\n"
-                else:
-                    combined_text += f"\n--- Failed to scrape {url} (Status: {response.status_code}) ---\n"
-            except Exception as e:
-                combined_text += f"\n--- Error scraping {url}: {str(e)} ---\n"
-                
-    return {"scraped_content": combined_text}
-
-# Node 2: Analyst
-def analyst_node(state: AgentState):
-    query = state['query']
-    content = state['scraped_content']
-    
-    system_prompt = SystemMessage(content="""You are a precise data extraction specialist. 
-    Your goal is to extract EXACT steps, button labels, and navigation paths from the scraped content.
-    If you see buttons like "Add Attendance", "Submit", "Select Subject", report them specifically.
-    Look for patterns that indicate a process.
-    Do not give general advice. Be specific to the labels found in the text.""")
-    
-    user_prompt = HumanMessage(content=f"Query: {query}\n\nScraped Content:\n{content}")
-    
-    response = llm.invoke([system_prompt, user_prompt])
-    return {"analysis": response.content}
-
-# Node 3: Responder
-def responder_node(state: AgentState):
-    query = state['query']
-    analysis = state['analysis']
-    
-    system_prompt = SystemMessage(content="""You are an expert Technical Assistant for the Attendance System.
-    Your tone must be helpful, direct, and conversational.
-    Start your response with a phrase like "In order to [user query]..." or "To [user query], you should...".
-    Format the response with clear headings and numbered lists.
-    Do not include internal logs or metadata in your response. Just the guide.""")
-    
-    user_prompt = HumanMessage(content=f"Query: {query}\nAnalysis:\n{analysis}")
-    
-    response = llm.invoke([system_prompt, user_prompt])
-    return {"final_response": response.content}
-
-# Node 4: Validation Agent
-def validation_node(state: AgentState):
-    query = state['query']
-    final_response = state['final_response']
-    raw_email = state.get('email')
-
-    # ✅ FIX: Always ensure email is a non-empty string for Google Sheets
-    email = raw_email.strip() if raw_email and str(raw_email).strip() else "Not Provided"
-    
-    # First, classify the query type
-    system_prompt = SystemMessage(content="""You are a query classifier for an Attendance Management System support assistant.
-    Your job is to classify the user's query into one of these categories:
-    
-    Classify as "IRRELEVANT" if the query is:
-    - About topics completely unrelated to attendance management (e.g., weather, sports, cooking, general knowledge)
-    - Personal questions not related to the system
-    - Random conversations or greetings without a question
-    - Questions about other software or systems
-    - Anything that has nothing to do with attendance, teaching, students, or the attendance system
-    
-    Classify as "COMPLAINT_OR_ISSUE" if the query contains:
-    - Complaints about system performance (slow, crashing, freezing, etc.)
-    - Bug reports or error messages
-    - Feature requests or suggestions for new features
-    - Complaints about UI/UX (colors, design, usability)
-    - Reports of broken functionality
-    - Frustration with the system
-    
-    Classify as "NORMAL_QUESTION" if the query is:
-    - A how-to question about the attendance system
-    - Asking for instructions or guidance on using the system
-    - Seeking information about existing features
-    - Questions about attendance, students, subjects, or teaching-related tasks
-    
-    IMPORTANT: Focus ONLY on the user's query, NOT on the assistant's response.
-    
-    Respond with ONLY one phrase: "IRRELEVANT", "COMPLAINT_OR_ISSUE", or "NORMAL_QUESTION".""")
-    
-    user_prompt = HumanMessage(content=f"User Query: {query}")
-    
-    classification = llm.invoke([system_prompt, user_prompt])
-    query_type = classification.content.strip().upper()
-    
-    # Handle irrelevant queries
-    if "IRRELEVANT" in query_type:
-        polite_response = """I appreciate your question, but I'm specifically designed to assist with the Attendance Management System. 
-
-I can help you with:
-- How to mark attendance
-- Managing student records
-- Navigating the dashboard
-- Understanding system features
-- Viewing attendance reports
-- Reporting issues or suggesting improvements
-
-If you have any questions related to the attendance system, I'd be happy to help!"""
-        
-        return {
-            "validation_status": "IRRELEVANT - Polite redirect",
-            "final_response": polite_response
-        }
-    
-    # If it's a complaint or issue, log to Google Sheets with email
-    if "COMPLAINT_OR_ISSUE" in query_type:
-        try:
-            # Get credentials from environment
-            creds_json = os.getenv("GOOGLE_CREDENTIALS_JSON")
-            sheet_id = os.getenv("GOOGLE_SHEET_ID")
-            
-            if creds_json and sheet_id:
-                # Parse credentials
-                creds_dict = json.loads(creds_json)
-                
-                # Authenticate with Google Sheets
-                scope = ['https://spreadsheets.google.com/feeds',
-                         'https://www.googleapis.com/auth/drive']
-                creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, scope)
-                client = gspread.authorize(creds)
-                
-                # Open the sheet and append query with email
-                sheet = client.open_by_key(sheet_id).sheet1
-                from datetime import datetime
-                timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                
-                # ✅ FIX: email is already sanitized above — always a proper string
-                sheet.append_row([timestamp, email, query])
-                
-                # Override the response with acknowledgment message
-                acknowledgment = f"""Thank you for bringing this to our attention. We have recorded your feedback with your email: {email} and our team will review this issue. We appreciate your patience and will work on resolving this as soon as possible.
-
-If you have any urgent concerns, please contact our support team at: m.ahmedofficial677@gmail.com"""
-                
-                return {
-                    "validation_status": "COMPLAINT/ISSUE - Logged to Google Sheets",
-                    "final_response": acknowledgment
-                }
-            else:
-                # No credentials, but still show acknowledgment
-                acknowledgment = f"""Thank you for bringing this to our attention. We have recorded your feedback with your email: {email} and our team will review this issue. We appreciate your patience and will work on resolving this as soon as possible.
-
-If you have any urgent concerns, please contact our support team at: m.ahmedofficial677@gmail.com"""
-                return {
-                    "validation_status": "COMPLAINT/ISSUE - No Google Sheets credentials configured",
-                    "final_response": acknowledgment
-                }
-        except Exception as e:
-            # Error logging, but still show acknowledgment
-            acknowledgment = f"""Thank you for bringing this to our attention. We have recorded your feedback with your email: {email} and our team will review this issue. We appreciate your patience and will work on resolving this as soon as possible.
-
-If you have any urgent concerns, please contact our support team at: m.ahmedofficial677@gmail.com"""
-            return {
-                "validation_status": f"COMPLAINT/ISSUE - Error logging: {str(e)}",
-                "final_response": acknowledgment
-            }
-    
-    return {"validation_status": "NORMAL_QUESTION - Not logged"}
-
-# Build the graph
-workflow = StateGraph(AgentState)
-workflow.add_node("scrape", scraper_node)
-workflow.add_node("analyze", analyst_node)
-workflow.add_node("respond", responder_node)
-workflow.add_node("validate", validation_node)
-workflow.set_entry_point("scrape")
-workflow.add_edge("scrape", "analyze")
-workflow.add_edge("analyze", "respond")
-workflow.add_edge("respond", "validate")
-workflow.add_edge("validate", END)
-graph_app = workflow.compile()
+    snapshot = get_current_snapshot()
+    
+    if snapshot is None or not all(url in snapshot["page_map"] for url in urls):
+        # No content at all yet: this request waits for the first scrape
+        await refresh_snapshot(urls)
+        snapshot = get_current_snapshot()
+    elif snapshot_is_stale():
+        # Serve the stale copy and refresh in the background, for runtimes
+        # where the lifespan refresher isn't running
+        schedule_snapshot_refresh(urls)
+    
+    return scraped_update([snapshot["page_map"][url] for url in urls])
+
+# GRAPH_MODE picks the default graph per deployment and a request may override
+# it with its "mode" field
+graphs = {mode: build_graph(scraper_node, mode, complaint_node) for mode in GRAPH_MODES}
+graph_app = graphs[GRAPH_MODE]
+
+answer_cache = AnswerCache(ANSWER_CACHE_SIZE, ANSWER_CACHE_TTL)
+semantic_cache = SemanticCache(SEMANTIC_CACHE_THRESHOLD, SEMANTIC_CACHE_MAX_BYTES)
+
+# Single-flight: concurrent identical queries (same answer-cache key) share one
+# in-flight graph run instead of each paying for their own LLM calls
+in_flight: Dict[tuple, asyncio.Future] = {}
+
+async def run_graph_coalesced(graph, key: tuple, initial_state: dict) -> dict:
+    task = in_flight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(graph.ainvoke(initial_state))
+        in_flight[key] = task
+        task.add_done_callback(lambda done: in_flight.pop(key, None) if in_flight.get(key) is done else None)
+        # shield() keeps the shared run alive if the first caller disconnects
+        return await asyncio.shield(task)
+    
+    result = await asyncio.shield(task)
+    # Every complaint is one outbox row, even when two callers send the same
+    # text at once (anonymous ones included): the classification is reused
+    # and the follower's own complaint is logged with its own email
+    if result.get("query_type") == "COMPLAINT_OR_ISSUE":
+        return {**result, "email": initial_state["email"], **await complaint_node(initial_state)}
+    return result
 
 class QueryRequest(BaseModel):
     query: str
     email: Optional[str] = None
+    mode: Optional[Literal["two_pass", "single_pass"]] = None
+
+def build_initial_state(request: QueryRequest) -> dict:
+    # Pass email to the state
+    return initial_state(request.query, TARGET_URLS, request.email)
+
+# Exact-match lookup first, then the semantic cache. Answers are cached per
+# graph mode and carry the hashes of the pages they were built from
+def lookup_cached_answer(normalized: str, mode: str) -> Optional[str]:
+    cache_key = (normalized, mode)
+    page_hashes = current_page_hashes()
+    cached = answer_cache.get(cache_key, page_hashes)
+    if cached is None:
+        similar = semantic_cache.get(normalized, mode, page_hashes)
+        if similar is not None:
+            cached, dependencies = similar
+            answer_cache.put(cache_key, cached, dependencies)
+    return cached
+
+def store_answer(normalized: str, mode: str, result: dict):
+    if not is_cacheable(result):
+        return
+    built_from = result.get("page_hashes") or {}
+    dependencies = {url: built_from[url] for url in pages_used(result) if url in built_from}
+    # Pages changed while the graph ran: the answer is already stale
+    if not is_fresh(dependencies, current_page_hashes()):
+        return
+    answer_cache.put((normalized, mode), result['final_response'], dependencies)
+    semantic_cache.put(normalized, mode, result['final_response'], dependencies)
 
 @app.post("/api/query")
 async def query_attendance(request: QueryRequest):
-    urls = [
-        "https://attendance-management-system-fronte-two.vercel.app/teacher/dashboard",
-        "https://attendance-management-system-fronte-two.vercel.app/teacher/subject",
-        "https://attendance-management-system-fronte-two.vercel.app/teacher/attendance",
-        "https://attendance-management-system-fronte-two.vercel.app/teacher/attendance-report"
-    ]
+    mode = request.mode or GRAPH_MODE
+    normalized = normalize_query(request.query)
+    cached = lookup_cached_answer(normalized, mode)
+    if cached is not None:
+        return {"response": cached}
     
-    initial_state = {
-        "query": request.query,
-        "urls": urls,
-        "scraped_content": "",
-        "analysis": "",
-        "final_response": "",
-        "validation_status": "",
-        "email": request.email  # Pass email to the state
-    }
+    initial_state = build_initial_state(request)
     
     try:
-        result = await graph_app.ainvoke(initial_state)
+        result = await run_graph_coalesced(graphs[mode], (normalized, mode), initial_state)
+        store_answer(normalized, mode, result)
         return {"response": result['final_response']}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+# Same as /api/query, but streams the responder's tokens as Server-Sent Events:
+# "token" events carry text as it is generated, then one "done" event carries
+# the full response (or an "error" event if the graph fails)
+@app.post("/api/query/stream")
+async def query_attendance_stream(request: QueryRequest):
+    mode = request.mode or GRAPH_MODE
+    normalized = normalize_query(request.query)
+    
+    async def events():
+        cached = lookup_cached_answer(normalized, mode)
+        if cached is not None:
+            yield sse_event("token", {"content": cached})
+            yield sse_event("done", {"response": cached})
+            return
+        
+        result = {}
+        streamed = False
+        try:
+            async for stream_mode, chunk in graphs[mode].astream(build_initial_state(request), stream_mode=["messages", "updates"]):
+                if stream_mode == "messages":
+                    message, metadata = chunk
+                    if metadata.get("langgraph_node") == "respond" and message.content:
+                        streamed = True
+                        yield sse_event("token", {"content": message.content})
+                else:
+                    for update in chunk.values():
+                        result.update(update or {})
+        except Exception as e:
+            yield sse_event("error", {"detail": str(e)})
+            return
+        
+        # The redirect and complaint branches make no streamed LLM call
+        if not streamed and result.get("final_response"):
+            yield sse_event("token", {"content": result["final_response"]})
+        store_answer(normalized, mode, result)
+        yield sse_event("done", {"response": result.get("final_response", "")})
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+
+@app.get("/api/metrics/tokens")
+def token_stats():
+    return token_metrics
+
+@app.get("/api/cache/stats")
+def cache_stats():
+    return {
+        "answer_cache": answer_cache.stats(),
+        "semantic_cache": semantic_cache.stats(),
+    }
+
 @app.get("/")
 def read_root():
     return {"status": "Attendance System Assistant API is running"}
@@ -261,4 +217,4 @@ def read_root():
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
-    
\ No newline at end of file
+    
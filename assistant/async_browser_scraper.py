@@ -0,0 +1,125 @@
+import os
+import asyncio
+from typing import List, Optional
+from playwright.async_api import async_playwright
+
+from .browser_scraper import (
+    BLOCKED_RESOURCE_TYPES,
+    BLOCKED_URL_PATTERNS,
+    PAGE_WAIT_UNTIL,
+    READY_ARGS,
+    WAIT_FOR_READY_JS,
+    render_page,
+    should_block,
+)
+from .state import ScrapedPage
+
+# Max number of pages rendered at the same time
+RENDER_CONCURRENCY = max(1, int(os.getenv("RENDER_CONCURRENCY", "4")))
+
+async def route_request(route):
+    if should_block(route.request):
+        await route.abort()
+    else:
+        await route.continue_()
+
+# New browser context with request blocking installed
+async def new_context(browser):
+    context = await browser.new_context()
+    if BLOCKED_RESOURCE_TYPES or BLOCKED_URL_PATTERNS:
+        await context.route("**/*", route_request)
+    return context
+
+# Async twin of browser_scraper.scrape_page
+async def scrape_page(page, url: str) -> ScrapedPage:
+    try:
+        await page.goto(url, wait_until=PAGE_WAIT_UNTIL, timeout=60000)
+
+        # Scroll to bottom to trigger lazy loading, then wait until the page settles
+        await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+        await page.evaluate(WAIT_FOR_READY_JS, READY_ARGS)
+
+        return render_page(url, await page.content())
+    except Exception as e:
+        return ScrapedPage(url, f"\n--- Error scraping {url}: {str(e)} ---\n")
+
+# Long-lived async browser. Each URL gets its own page (in its own context),
+# and up to RENDER_CONCURRENCY pages render at once, so a batch takes about as
+# long as its slowest page. Up to RENDER_CONCURRENCY idle pages are kept for
+# reuse. The pool lives on the event loop that started it
+class AsyncBrowserPool:
+    def __init__(self, size: int, concurrency: int):
+        self.size = size
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.start_lock = asyncio.Lock()
+        self.playwright = None
+        self.browser = None
+        self.idle_pages = []
+
+    async def start(self):
+        async with self.start_lock:
+            if self.browser is not None and self.browser.is_connected():
+                return
+            # First use, or the browser crashed: start from scratch
+            await self.stop()
+            self.playwright = await async_playwright().start()
+            self.browser = await self.playwright.chromium.launch(headless=True)
+
+    async def acquire(self):
+        await self.start()
+        while self.idle_pages:
+            page = self.idle_pages.pop()
+            if not page.is_closed():
+                return page
+        context = await new_context(self.browser)
+        return await context.new_page()
+
+    async def release(self, page):
+        if page.is_closed():
+            return
+        if len(self.idle_pages) < self.size:
+            self.idle_pages.append(page)
+        else:
+            await page.context.close()
+
+    async def render(self, url: str) -> ScrapedPage:
+        async with self.semaphore:
+            page = await self.acquire()
+            try:
+                return await scrape_page(page, url)
+            finally:
+                await self.release(page)
+
+    # One page per URL, in input order
+    async def scrape_pages(self, urls: List[str]) -> List[ScrapedPage]:
+        return list(await asyncio.gather(*(self.render(url) for url in urls)))
+
+    async def stop(self):
+        self.idle_pages = []
+        if self.browser is not None:
+            try:
+                await self.browser.close()
+            except Exception:
+                pass
+            self.browser = None
+        if self.playwright is not None:
+            await self.playwright.stop()
+            self.playwright = None
+
+async_browser_pool: Optional[AsyncBrowserPool] = None
+
+def get_async_browser_pool() -> AsyncBrowserPool:
+    global async_browser_pool
+    if async_browser_pool is None:
+        async_browser_pool = AsyncBrowserPool(RENDER_CONCURRENCY, RENDER_CONCURRENCY)
+    return async_browser_pool
+
+async def close_async_browser_pool():
+    global async_browser_pool
+    if async_browser_pool is not None:
+        await async_browser_pool.stop()
+        async_browser_pool = None
+
+# Render every URL concurrently with the shared async browser
+async def scrape_pages(urls: List[str]) -> List[ScrapedPage]:
+    return await get_async_browser_pool().scrape_pages(urls)
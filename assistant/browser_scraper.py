@@ -0,0 +1,163 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+from playwright.sync_api import sync_playwright
+
+from .pages import process_html
+from .state import ScrapedPage
+
+# Page readiness. After navigation (PAGE_WAIT_UNTIL) and the lazy-loading
+# scroll, the page counts as ready as soon as READY_SELECTOR matches, the DOM has
+# had no mutations for READY_QUIET_MS, or READY_MAX_MS has passed, whichever
+# comes first. This replaces a fixed 2 s sleep per page
+PAGE_WAIT_UNTIL = os.getenv("PAGE_WAIT_UNTIL", "networkidle")
+READY_SELECTOR = os.getenv("READY_SELECTOR", "")
+READY_QUIET_MS = int(os.getenv("READY_QUIET_MS", "300"))
+READY_MAX_MS = int(os.getenv("READY_MAX_MS", "2000"))
+
+READY_ARGS = {"selector": READY_SELECTOR, "quietMs": READY_QUIET_MS, "maxMs": READY_MAX_MS}
+
+# Resolves with the reason the page was considered ready
+WAIT_FOR_READY_JS = """({selector, quietMs, maxMs}) => new Promise((resolve) => {
+    let quietTimer = null;
+    let poller = null;
+    let observer = null;
+    const finish = (reason) => {
+        if (observer) observer.disconnect();
+        clearTimeout(quietTimer);
+        clearTimeout(maxTimer);
+        clearInterval(poller);
+        resolve(reason);
+    };
+    const maxTimer = setTimeout(() => finish("timeout"), maxMs);
+    if (selector) {
+        if (document.querySelector(selector)) return finish("selector");
+        poller = setInterval(() => {
+            if (document.querySelector(selector)) finish("selector");
+        }, 50);
+    }
+    observer = new MutationObserver(() => {
+        clearTimeout(quietTimer);
+        quietTimer = setTimeout(() => finish("quiet"), quietMs);
+    });
+    observer.observe(document, {subtree: true, childList: true, attributes: true, characterData: true});
+    quietTimer = setTimeout(() => finish("quiet"), quietMs);
+})"""
+
+# Requests the scraper never needs: only text and interactive labels are
+# extracted, so images, fonts, media and analytics beacons are aborted before
+# they hit the network. Both lists are comma-separated; URL patterns match as
+# substrings. Set either to an empty string to allow everything of that kind
+BLOCKED_RESOURCE_TYPES = set(filter(None, os.getenv("BLOCKED_RESOURCE_TYPES", "image,font,media").split(",")))
+BLOCKED_URL_PATTERNS = list(filter(None, os.getenv(
+    "BLOCKED_URL_PATTERNS",
+    "google-analytics.com,googletagmanager.com,doubleclick.net,/_vercel/insights,/_vercel/speed-insights,"
+    "vitals.vercel-insights.com,hotjar.com,segment.io,connect.facebook.net",
+).split(",")))
+
+def should_block(request) -> bool:
+    if request.resource_type in BLOCKED_RESOURCE_TYPES:
+        return True
+    return any(pattern in request.url for pattern in BLOCKED_URL_PATTERNS)
+
+def route_request(route):
+    if should_block(route.request):
+        route.abort()
+    else:
+        route.continue_()
+
+# New browser context with request blocking installed
+def new_context(browser):
+    context = browser.new_context()
+    if BLOCKED_RESOURCE_TYPES or BLOCKED_URL_PATTERNS:
+        context.route("**/*", route_request)
+    return context
+
+# Turn a rendered page's HTML into the text block and UI map the graph consumes.
+# The UI map already lists the page's buttons and links, so their labels are
+# not repeated under the text
+def render_page(url: str, html: str) -> ScrapedPage:
+    processed = process_html(url, html)
+    block = f"\n--- Content from {url} ---\n{processed.text}\n"
+    return ScrapedPage(url, block, processed.ui_map, processed.raw_hash)
+
+# Render a single page in the browser and return its cleaned text block and UI map
+def scrape_page(page, url: str) -> ScrapedPage:
+    try:
+        page.goto(url, wait_until=PAGE_WAIT_UNTIL, timeout=60000)
+        
+        # Scroll to bottom to trigger lazy loading, then wait until the page settles
+        page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+        page.evaluate(WAIT_FOR_READY_JS, READY_ARGS)
+        
+        return render_page(url, page.content())
+    except Exception as e:
+        return ScrapedPage(url, f"\n--- Error scraping {url}: {str(e)} ---\n")
+
+# Long-lived browser shared by every query in the process. Chromium is launched
+# once and a single page (in its own context) stays open and visits the URLs one
+# after another. The sync Playwright objects belong to the thread that created
+# them, so all browser work runs on one worker thread; for concurrent rendering
+# use the async backend (async_browser_scraper)
+class BrowserPool:
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="playwright")
+        self.playwright = None
+        self.browser = None
+        self.page = None
+    
+    def start(self):
+        if self.browser is not None and self.browser.is_connected():
+            return
+        # First use, or the browser crashed: start from scratch
+        self.stop()
+        self.playwright = sync_playwright().start()
+        self.browser = self.playwright.chromium.launch(headless=True)
+    
+    def get_page(self):
+        self.start()
+        if self.page is None or self.page.is_closed():
+            self.page = new_context(self.browser).new_page()
+        return self.page
+    
+    def scrape(self, urls: List[str]) -> List[ScrapedPage]:
+        page = self.get_page()
+        return [scrape_page(page, url) for url in urls]
+    
+    def stop(self):
+        self.page = None
+        if self.browser is not None:
+            try:
+                self.browser.close()
+            except Exception:
+                pass
+            self.browser = None
+        if self.playwright is not None:
+            self.playwright.stop()
+            self.playwright = None
+    
+    # Thread-safe entry points: hand the work to the browser thread and wait
+    def scrape_pages(self, urls: List[str]) -> List[ScrapedPage]:
+        return self.executor.submit(self.scrape, urls).result()
+    
+    def close(self):
+        self.executor.submit(self.stop).result()
+        self.executor.shutdown()
+
+browser_pool: Optional[BrowserPool] = None
+
+def get_browser_pool() -> BrowserPool:
+    global browser_pool
+    if browser_pool is None:
+        browser_pool = BrowserPool()
+    return browser_pool
+
+def close_browser_pool():
+    global browser_pool
+    if browser_pool is not None:
+        browser_pool.close()
+        browser_pool = None
+
+# Render every URL with the shared browser, one page per URL in input order
+def scrape_pages(urls: List[str]) -> List[ScrapedPage]:
+    return get_browser_pool().scrape_pages(urls)
@@ -0,0 +1,210 @@
+import os
+import re
+import time
+import zlib
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+# Answer cache in front of the graph. Keys are the normalized query plus the
+# graph mode. Each entry records the hash of every page the answer was built
+# from (see state.pages_used), and is dropped as soon as one of those pages
+# changes, so a refresh only invalidates answers that drew on changed pages.
+# Least recently used entries are evicted first
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "512"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+
+def normalize_query(query: str) -> str:
+    query = re.sub(r"[^\w\s]", "", query.casefold())
+    return " ".join(query.split())
+
+# True while every page an answer depends on still has the same content
+def is_fresh(dependencies: Dict[str, str], page_hashes: Dict[str, str]) -> bool:
+    return all(page_hashes.get(url) == content_hash for url, content_hash in dependencies.items())
+
+class AnswerCache:
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+    
+    def get(self, key: tuple, page_hashes: Dict[str, str]) -> Optional[str]:
+        entry = self.entries.get(key)
+        if entry is not None and time.monotonic() - entry[1] > self.ttl:
+            del self.entries[key]
+            entry = None
+        if entry is not None and not is_fresh(entry[2], page_hashes):
+            del self.entries[key]
+            self.invalidations += 1
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return entry[0]
+    
+    def put(self, key: tuple, response: str, dependencies: Dict[str, str]):
+        if self.max_size <= 0:
+            return
+        self.entries[key] = (response, time.monotonic(), dependencies)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+    
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+# Semantic cache for paraphrased queries. Queries are embedded locally with a
+# hashed TF-IDF vectorizer (content-word unigrams and bigrams, no model download
+# or network call) and compared by cosine similarity against past queries answered
+# in the same graph mode. Entries whose pages changed are dropped, as in the
+# answer cache. A query has only a handful of terms, so each entry is stored as
+# a sparse row (hashed term ids and their weights). Memory, including the
+# stacked lookup arrays and the temporaries of a lookup, is bounded by
+# SEMANTIC_CACHE_MAX_BYTES; least recently used entries are evicted first
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.9"))
+SEMANTIC_CACHE_MAX_BYTES = int(os.getenv("SEMANTIC_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
+SEMANTIC_CACHE_DIM = 4096
+
+# Bytes held per stored term: the entry's own id and weight (4 + 4), its copy
+# in the stacked lookup arrays (id, weight, row: 4 + 4 + 4) and up to five
+# float64 temporaries per term while a lookup runs (5 * 8)
+SEMANTIC_CACHE_BYTES_PER_TERM = 8 + 12 + 40
+
+QUERY_STOPWORDS = {
+    "a", "an", "the", "i", "me", "my", "we", "you", "it", "is", "are", "am", "be",
+    "do", "does", "can", "could", "would", "should", "will", "how", "what", "where",
+    "when", "which", "to", "of", "in", "on", "for", "and", "or", "please", "there",
+}
+
+# Sparse hashed term frequencies: (sorted term ids, weights)
+def hashed_term_frequencies(normalized_query: str) -> Tuple[np.ndarray, np.ndarray]:
+    words = [word for word in normalized_query.split() if word not in QUERY_STOPWORDS]
+    terms = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    ids = np.array([zlib.crc32(term.encode("utf-8")) % SEMANTIC_CACHE_DIM for term in terms], dtype=np.int32)
+    ids, counts = np.unique(ids, return_counts=True)
+    # Sublinear term frequency
+    return ids.astype(np.int32), np.log1p(counts).astype(np.float32)
+
+class SemanticCache:
+    def __init__(self, threshold: float, max_bytes: int):
+        self.threshold = threshold
+        self.max_bytes = max_bytes
+        self.term_ids: List[np.ndarray] = []
+        self.weights: List[np.ndarray] = []
+        self.responses: List[str] = []
+        self.modes: List[str] = []
+        self.dependencies: List[Dict[str, str]] = []
+        self.last_used: List[float] = []
+        # Page hashes the entries were last checked against
+        self.checked_hashes: Dict[str, str] = {}
+        self.doc_freq = np.zeros(SEMANTIC_CACHE_DIM, dtype=np.float32)
+        # All rows stacked for lookups (term ids, weights, row of each term),
+        # rebuilt lazily after a change
+        self.stacked: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None
+        self.bytes_used = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+    
+    def entry_bytes(self, index: int) -> int:
+        return len(self.term_ids[index]) * SEMANTIC_CACHE_BYTES_PER_TERM + len(self.responses[index].encode("utf-8"))
+    
+    # Evict every entry that depends on a page whose content changed
+    def invalidate(self, page_hashes: Dict[str, str]):
+        if page_hashes == self.checked_hashes:
+            return
+        stale = [i for i, dependencies in enumerate(self.dependencies) if not is_fresh(dependencies, page_hashes)]
+        for index in reversed(stale):
+            self.evict(index)
+        self.invalidations += len(stale)
+        self.checked_hashes = dict(page_hashes)
+    
+    # Returns the cached response and the page hashes it depends on
+    def get(self, normalized_query: str, mode: str, page_hashes: Dict[str, str]) -> Optional[Tuple[str, Dict[str, str]]]:
+        self.invalidate(page_hashes)
+        if not self.term_ids:
+            self.misses += 1
+            return None
+        if self.stacked is None:
+            self.stacked = (
+                np.concatenate(self.term_ids),
+                np.concatenate(self.weights),
+                np.repeat(np.arange(len(self.term_ids), dtype=np.int32), [len(ids) for ids in self.term_ids]),
+            )
+        term_ids, weights, rows = self.stacked
+        count = len(self.term_ids)
+        
+        idf = np.log((1.0 + count) / (1.0 + self.doc_freq)) + 1.0
+        query_ids, query_weights = hashed_term_frequencies(normalized_query)
+        query = np.zeros(SEMANTIC_CACHE_DIM)
+        query[query_ids] = query_weights * idf[query_ids]
+        query_norm = np.linalg.norm(query)
+        if query_norm == 0:
+            self.misses += 1
+            return None
+        
+        weighted = weights * idf[term_ids]
+        norms = np.sqrt(np.bincount(rows, weights=weighted * weighted, minlength=count)) * query_norm
+        dots = np.bincount(rows, weights=weighted * query[term_ids], minlength=count)
+        similarities = dots / np.where(norms == 0, 1.0, norms)
+        similarities[np.array(self.modes) != mode] = -1.0
+        
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.threshold:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.last_used[best] = time.monotonic()
+        return self.responses[best], self.dependencies[best]
+    
+    def put(self, normalized_query: str, mode: str, response: str, dependencies: Dict[str, str]):
+        term_ids, weights = hashed_term_frequencies(normalized_query)
+        if not len(term_ids):
+            return
+        self.term_ids.append(term_ids)
+        self.weights.append(weights)
+        self.responses.append(response)
+        self.modes.append(mode)
+        self.dependencies.append(dependencies)
+        self.last_used.append(time.monotonic())
+        self.doc_freq[term_ids] += 1
+        self.bytes_used += self.entry_bytes(len(self.term_ids) - 1)
+        self.stacked = None
+        
+        while self.bytes_used > self.max_bytes and self.term_ids:
+            self.evict(int(np.argmin(self.last_used)))
+    
+    def evict(self, index: int):
+        self.bytes_used -= self.entry_bytes(index)
+        self.doc_freq[self.term_ids[index]] -= 1
+        for column in (self.term_ids, self.weights, self.responses, self.modes, self.dependencies, self.last_used):
+            del column[index]
+        self.stacked = None
+    
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.term_ids),
+            "bytes": self.bytes_used,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+# Complaints are logged per user and echo their email, so they are never cached
+def is_cacheable(result: dict) -> bool:
+    return result.get("query_type") != "COMPLAINT_OR_ISSUE"
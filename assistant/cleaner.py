@@ -0,0 +1,64 @@
+import os
+import re
+from typing import Any, Callable, Optional, Tuple
+from bs4 import BeautifulSoup, FeatureNotFound
+
+# HTML cleaning. CLEANER_BACKEND picks the parser: "html.parser" (default,
+# pure Python BeautifulSoup), "lxml" (BeautifulSoup on the C lxml parser) or
+# "selectolax" (C lexbor parser, fastest). All three produce the same text for
+# well-formed pages; a backend whose package is missing falls back to html.parser
+CLEANER_BACKEND = os.getenv("CLEANER_BACKEND", "html.parser")
+# Noise is removed right after parsing. Layout tags are removed only before the
+# text is read: the UI map (see ui_map.py) reads the same tree in between and
+# needs the links in nav/header/footer
+NOISE_TAGS = ["script", "style", "svg"]
+LAYOUT_TAGS = ["nav", "footer", "header"]
+STRIPPED_TAGS = NOISE_TAGS + LAYOUT_TAGS
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+# Line breaks (everything str.splitlines() splits on) and runs of 2+ spaces
+PHRASE_BREAK = re.compile(r"[\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029]| {2,}")
+
+# Single-pass equivalent of splitlines() -> strip -> split("  ") -> strip
+def normalize_text(text: str) -> str:
+    return '\n'.join(phrase for phrase in (piece.strip() for piece in PHRASE_BREAK.split(text)) if phrase)
+
+def clean_html_bs4(html: str, parser: str, inspect: Optional[Callable] = None) -> Tuple[str, Any]:
+    soup = BeautifulSoup(html, parser)
+    
+    # Remove irrelevant tags
+    for tag in soup(NOISE_TAGS):
+        tag.extract()
+    inspected = inspect(soup, "bs4") if inspect else None
+    for tag in soup(LAYOUT_TAGS):
+        tag.extract()
+        
+    return normalize_text(soup.get_text(separator=' ')), inspected
+
+def clean_html_selectolax(html: str, inspect: Optional[Callable] = None) -> Tuple[str, Any]:
+    tree = LexborHTMLParser(html)
+    tree.strip_tags(NOISE_TAGS)
+    inspected = inspect(tree, "lexbor") if inspect else None
+    tree.strip_tags(LAYOUT_TAGS)
+    return (normalize_text(tree.root.text(separator=' ')) if tree.root else ""), inspected
+
+# Parse the page once with the configured backend and return its text, one
+# phrase per line, plus whatever inspect(tree, kind) read from the same tree
+# ("bs4" for a BeautifulSoup tree, "lexbor" for a selectolax one)
+def clean_html_and_inspect(html: str, inspect: Optional[Callable]) -> Tuple[str, Any]:
+    if CLEANER_BACKEND == "selectolax" and LexborHTMLParser is not None:
+        return clean_html_selectolax(html, inspect)
+    if CLEANER_BACKEND == "lxml":
+        try:
+            return clean_html_bs4(html, "lxml", inspect)
+        except FeatureNotFound:
+            pass
+    return clean_html_bs4(html, "html.parser", inspect)
+
+# Strip markup and collapse whitespace into one phrase per line
+def clean_html(html: str) -> str:
+    return clean_html_and_inspect(html, None)[0]
@@ -0,0 +1,241 @@
+import os
+import json
+import time
+import logging
+import asyncio
+import threading
+import sqlite3
+import tempfile
+from datetime import datetime
+from typing import List, Optional
+import gspread
+from oauth2client.service_account import ServiceAccountCredentials
+
+from .prompts import COMPLAINT_ACKNOWLEDGMENT
+from .state import AgentState
+
+logger = logging.getLogger(__name__)
+
+# Authorized worksheet handle, kept for the life of the process so complaints
+# don't repeat the OAuth handshake and spreadsheet lookup every time. gspread's
+# authorized session refreshes the access token by itself; the handle is only
+# rebuilt when the credentials or sheet change, or after a failed write
+sheet_lock = threading.Lock()
+cached_sheet = None
+cached_sheet_key: Optional[tuple] = None
+
+def get_complaint_sheet(creds_json: str, sheet_id: str):
+    global cached_sheet, cached_sheet_key
+    with sheet_lock:
+        key = (creds_json, sheet_id)
+        if cached_sheet is None or cached_sheet_key != key:
+            # Parse credentials
+            creds_dict = json.loads(creds_json)
+            
+            # Authenticate with Google Sheets
+            scope = ['https://spreadsheets.google.com/feeds',
+                     'https://www.googleapis.com/auth/drive']
+            creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, scope)
+            client = gspread.authorize(creds)
+            
+            cached_sheet = client.open_by_key(sheet_id).sheet1
+            cached_sheet_key = key
+        return cached_sheet
+
+def reset_complaint_sheet():
+    global cached_sheet, cached_sheet_key
+    with sheet_lock:
+        cached_sheet = None
+        cached_sheet_key = None
+
+# Blocking Google Sheets write, run in a worker thread by the complaint flusher
+def append_complaint_rows(creds_json: str, sheet_id: str, rows: List[List[str]]):
+    try:
+        get_complaint_sheet(creds_json, sheet_id).append_rows(rows)
+    except Exception:
+        # Drop the handle so the next write re-authorizes from scratch
+        reset_complaint_sheet()
+        raise
+
+# Durable outbox for complaints. complaint_node only appends a row to a local
+# SQLite file; a background worker ships pending rows to Google Sheets in
+# batches and deletes them once the write succeeds, retrying with exponential
+# backoff while the Sheets API is failing. Several processes (uvicorn workers)
+# may share one outbox file: each flusher first claims a batch under a write
+# lock, so no row is sent by two processes at once. A claim older than
+# COMPLAINT_CLAIM_TIMEOUT seconds (its process died mid-send) can be taken over.
+# COMPLAINT_OUTBOX_PATH must point at persistent storage for complaints to
+# survive a restart; the temp-dir default is not durable on most hosts
+DEFAULT_COMPLAINT_OUTBOX_PATH = os.path.join(tempfile.gettempdir(), "complaint_outbox.sqlite3")
+COMPLAINT_OUTBOX_PATH = os.getenv("COMPLAINT_OUTBOX_PATH", DEFAULT_COMPLAINT_OUTBOX_PATH)
+COMPLAINT_CLAIM_TIMEOUT = float(os.getenv("COMPLAINT_CLAIM_TIMEOUT", "300"))
+COMPLAINT_BATCH_SIZE = int(os.getenv("COMPLAINT_BATCH_SIZE", "50"))
+COMPLAINT_FLUSH_INTERVAL = float(os.getenv("COMPLAINT_FLUSH_INTERVAL", "5"))
+COMPLAINT_MAX_BACKOFF = float(os.getenv("COMPLAINT_MAX_BACKOFF", "300"))
+
+class ComplaintOutbox:
+    def __init__(self, path: str):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS complaints (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            created_at TEXT NOT NULL,
+            email TEXT NOT NULL,
+            query TEXT NOT NULL,
+            claimed_at REAL
+        )""")
+        # Outbox files created before batches were claimed
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(complaints)")]
+        if "claimed_at" not in columns:
+            self.conn.execute("ALTER TABLE complaints ADD COLUMN claimed_at REAL")
+        self.conn.commit()
+    
+    def add(self, row: List[str]):
+        with self.lock:
+            self.conn.execute("INSERT INTO complaints (created_at, email, query) VALUES (?, ?, ?)", row)
+            self.conn.commit()
+    
+    # Oldest unclaimed rows (or rows whose claim expired), marked as claimed by
+    # this process. BEGIN IMMEDIATE takes the database write lock, so two
+    # processes can't claim the same rows
+    def claim(self, limit: int) -> List[tuple]:
+        with self.lock:
+            now = time.time()
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self.conn.execute(
+                    "SELECT id, created_at, email, query FROM complaints"
+                    " WHERE claimed_at IS NULL OR claimed_at < ? ORDER BY id LIMIT ?",
+                    (now - COMPLAINT_CLAIM_TIMEOUT, limit),
+                ).fetchall()
+                self.conn.executemany("UPDATE complaints SET claimed_at = ? WHERE id = ?", [(now, row[0]) for row in rows])
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+            return rows
+    
+    # Give claimed rows back after a failed send
+    def release(self, ids: List[int]):
+        with self.lock:
+            self.conn.executemany("UPDATE complaints SET claimed_at = NULL WHERE id = ?", [(i,) for i in ids])
+            self.conn.commit()
+    
+    def remove(self, ids: List[int]):
+        with self.lock:
+            self.conn.executemany("DELETE FROM complaints WHERE id = ?", [(i,) for i in ids])
+            self.conn.commit()
+
+complaint_outbox: Optional[ComplaintOutbox] = None
+complaint_worker: Optional[asyncio.Task] = None
+complaint_wakeup: Optional[asyncio.Event] = None
+
+def get_complaint_outbox() -> ComplaintOutbox:
+    global complaint_outbox
+    if complaint_outbox is None:
+        if COMPLAINT_OUTBOX_PATH == DEFAULT_COMPLAINT_OUTBOX_PATH:
+            logger.warning("COMPLAINT_OUTBOX_PATH is not set; queued complaints live in %s and may be lost on restart", COMPLAINT_OUTBOX_PATH)
+        complaint_outbox = ComplaintOutbox(COMPLAINT_OUTBOX_PATH)
+    return complaint_outbox
+
+# Ship every pending complaint to Google Sheets, one batch at a time
+async def flush_complaints() -> int:
+    creds_json = os.getenv("GOOGLE_CREDENTIALS_JSON")
+    sheet_id = os.getenv("GOOGLE_SHEET_ID")
+    if not (creds_json and sheet_id):
+        return 0
+    
+    outbox = get_complaint_outbox()
+    flushed = 0
+    while True:
+        batch = await asyncio.to_thread(outbox.claim, COMPLAINT_BATCH_SIZE)
+        if not batch:
+            return flushed
+        ids = [row[0] for row in batch]
+        try:
+            await asyncio.to_thread(append_complaint_rows, creds_json, sheet_id, [list(row[1:]) for row in batch])
+        except Exception:
+            await asyncio.to_thread(outbox.release, ids)
+            raise
+        await asyncio.to_thread(outbox.remove, ids)
+        flushed += len(batch)
+
+# Wait until a complaint is queued or the timeout passes. asyncio.wait is used
+# instead of wait_for, which on Python 3.11 can swallow a cancellation that
+# arrives just as the event is set and leave stop_complaint_worker hanging
+async def wait_for_wakeup(timeout: float):
+    waiter = asyncio.ensure_future(complaint_wakeup.wait())
+    try:
+        await asyncio.wait({waiter}, timeout=timeout)
+    finally:
+        waiter.cancel()
+
+async def complaint_flusher():
+    loop = asyncio.get_running_loop()
+    delay = COMPLAINT_FLUSH_INTERVAL
+    next_attempt_at = loop.time() + delay
+    while True:
+        timeout = next_attempt_at - loop.time()
+        if timeout > 0:
+            await wait_for_wakeup(timeout)
+        complaint_wakeup.clear()
+        # While backing off after a failed write, new complaints wait for the
+        # scheduled retry instead of retrying the whole batch right away
+        if delay > COMPLAINT_FLUSH_INTERVAL and loop.time() < next_attempt_at:
+            continue
+        try:
+            await flush_complaints()
+            delay = COMPLAINT_FLUSH_INTERVAL
+        except Exception:
+            delay = min(delay * 2, COMPLAINT_MAX_BACKOFF)
+        next_attempt_at = loop.time() + delay
+
+# Start the flusher on the running loop if it isn't already running
+def ensure_complaint_worker():
+    global complaint_worker, complaint_wakeup
+    if complaint_worker is None or complaint_worker.done():
+        complaint_wakeup = asyncio.Event()
+        complaint_worker = asyncio.create_task(complaint_flusher())
+
+async def stop_complaint_worker():
+    global complaint_worker
+    if complaint_worker is not None:
+        complaint_worker.cancel()
+        try:
+            await complaint_worker
+        except asyncio.CancelledError:
+            pass
+        complaint_worker = None
+
+# Branch: complaints and issues are queued for Google Sheets with the email
+async def complaint_node(state: AgentState):
+    query = state['query']
+    raw_email = state.get('email')
+
+    # ✅ FIX: Always ensure email is a non-empty string for Google Sheets
+    email = raw_email.strip() if raw_email and str(raw_email).strip() else "Not Provided"
+    
+    try:
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        
+        # ✅ FIX: email is already sanitized above — always a proper string
+        # Only the local outbox write happens in the request path
+        await asyncio.to_thread(get_complaint_outbox().add, [timestamp, email, query])
+        ensure_complaint_worker()
+        complaint_wakeup.set()
+        
+        if os.getenv("GOOGLE_CREDENTIALS_JSON") and os.getenv("GOOGLE_SHEET_ID"):
+            validation_status = "COMPLAINT/ISSUE - Queued for Google Sheets"
+        else:
+            validation_status = "COMPLAINT/ISSUE - Queued, no Google Sheets credentials configured"
+    except Exception as e:
+        # Error logging, but still show acknowledgment
+        validation_status = f"COMPLAINT/ISSUE - Error logging: {str(e)}"
+    
+    # Override the response with acknowledgment message
+    acknowledgment = COMPLAINT_ACKNOWLEDGMENT.format(email=email)
+    
+    return {
+        "validation_status": validation_status,
+        "final_response": acknowledgment
+    }
@@ -0,0 +1,153 @@
+import os
+from langchain_core.messages import HumanMessage, SystemMessage
+from langgraph.graph import StateGraph, END
+
+from .llm import invoke_llm
+from .prompts import (
+    ANALYST_PROMPT,
+    RESPONDER_PROMPT,
+    SINGLE_PASS_PROMPT,
+    CLASSIFIER_PROMPT,
+    IRRELEVANT_RESPONSE,
+)
+from .retrieval import CONTENT_SELECTION, CONTEXT_TOKEN_BUDGET, MAX_CONTEXT_TOKENS, select_context, truncate_to_tokens
+from .state import AgentState
+from .tokens import count_tokens
+from .ui_map import fit_ui_maps, render_ui_maps
+
+# Tokens the rendered UI maps take in the prompt
+def ui_map_tokens(ui_maps: list) -> int:
+    return count_tokens(f"UI Map:\n{render_ui_maps(ui_maps)}") if ui_maps else 0
+
+# Node 1b: Content selection. The UI maps that fit their own budget are kept,
+# and the tokens they take come out of the content budget, so the map doesn't
+# grow the prompt
+async def select_node(state: AgentState):
+    ui_maps = fit_ui_maps(state['ui_maps'])
+    if CONTENT_SELECTION != "bm25":
+        return {"context": state['scraped_content'], "ui_maps": ui_maps}
+    budget = max(0, CONTEXT_TOKEN_BUDGET - ui_map_tokens(ui_maps))
+    return {"context": select_context(state['query'], state['scraped_content'], budget), "ui_maps": ui_maps}
+
+# Node 1c: Token budget, shared by the UI maps and the content
+async def budget_node(state: AgentState):
+    budget = max(0, MAX_CONTEXT_TOKENS - ui_map_tokens(state['ui_maps']))
+    return {"context": truncate_to_tokens(state['context'], budget)}
+
+# Query plus the page UI maps (when the scraper produced any) and the selected content
+def extraction_input(state: AgentState) -> str:
+    parts = [f"Query: {state['query']}"]
+    if state['ui_maps']:
+        parts.append(f"UI Map:\n{render_ui_maps(state['ui_maps'])}")
+    parts.append(f"Scraped Content:\n{state['context']}")
+    return "\n\n".join(parts)
+
+# Node 2: Analyst
+async def analyst_node(state: AgentState):
+    system_prompt = SystemMessage(content=ANALYST_PROMPT)
+    
+    user_prompt = HumanMessage(content=extraction_input(state))
+    
+    response = await invoke_llm("analyze", [system_prompt, user_prompt])
+    return {"analysis": response.content}
+
+# Node 3: Responder
+async def responder_node(state: AgentState):
+    query = state['query']
+    analysis = state['analysis']
+    
+    system_prompt = SystemMessage(content=RESPONDER_PROMPT)
+    
+    user_prompt = HumanMessage(content=f"Query: {query}\nAnalysis:\n{analysis}")
+    
+    response = await invoke_llm("respond", [system_prompt, user_prompt])
+    return {"final_response": response.content}
+
+# Node 2+3 (single-pass mode): extract the steps and write the guide in one LLM call
+async def single_pass_node(state: AgentState):
+    system_prompt = SystemMessage(content=SINGLE_PASS_PROMPT)
+    
+    user_prompt = HumanMessage(content=extraction_input(state))
+    
+    response = await invoke_llm("single_pass", [system_prompt, user_prompt])
+    return {"final_response": response.content}
+
+# Node 4: Validation Agent
+# Runs first so irrelevant queries and complaints skip the scrape/analyst/responder chain
+async def validation_node(state: AgentState):
+    query = state['query']
+    
+    # First, classify the query type
+    system_prompt = SystemMessage(content=CLASSIFIER_PROMPT)
+    
+    user_prompt = HumanMessage(content=f"User Query: {query}")
+    
+    classification = await invoke_llm("validate", [system_prompt, user_prompt])
+    query_type = classification.content.strip().upper()
+    
+    if "IRRELEVANT" in query_type:
+        return {"query_type": "IRRELEVANT"}
+    if "COMPLAINT_OR_ISSUE" in query_type:
+        return {"query_type": "COMPLAINT_OR_ISSUE"}
+    return {
+        "query_type": "NORMAL_QUESTION",
+        "validation_status": "NORMAL_QUESTION - Not logged"
+    }
+
+# Pick the branch for the classified query
+def route_query(state: AgentState):
+    if state['query_type'] == "IRRELEVANT":
+        return "irrelevant"
+    if state['query_type'] == "COMPLAINT_OR_ISSUE":
+        return "complaint"
+    return "scrape"
+
+# Branch: irrelevant queries get a polite redirect
+async def irrelevant_node(state: AgentState):
+    return {
+        "validation_status": "IRRELEVANT - Polite redirect",
+        "final_response": IRRELEVANT_RESPONSE
+    }
+
+# Build the graph
+# "two_pass" runs the analyst and responder as separate LLM calls; "single_pass"
+# replaces both with one call. GRAPH_MODE picks the default per deployment
+GRAPH_MODES = ("two_pass", "single_pass")
+GRAPH_MODE = os.getenv("GRAPH_MODE", "two_pass")
+if GRAPH_MODE not in GRAPH_MODES:
+    GRAPH_MODE = "two_pass"
+
+# Each entry point brings its own scraper node. With a complaint_node the query
+# is classified first and irrelevant queries and complaints skip the answer
+# chain; without one (the CLI) every query is answered
+def build_graph(scraper_node, mode: str = GRAPH_MODE, complaint_node=None):
+    workflow = StateGraph(AgentState)
+    workflow.add_node("scrape", scraper_node)
+    workflow.add_node("select", select_node)
+    workflow.add_node("budget", budget_node)
+    if complaint_node is not None:
+        workflow.add_node("validate", validation_node)
+        workflow.add_node("irrelevant", irrelevant_node)
+        workflow.add_node("complaint", complaint_node)
+        workflow.set_entry_point("validate")
+        workflow.add_conditional_edges("validate", route_query, {
+            "irrelevant": "irrelevant",
+            "complaint": "complaint",
+            "scrape": "scrape",
+        })
+        workflow.add_edge("irrelevant", END)
+        workflow.add_edge("complaint", END)
+    else:
+        workflow.set_entry_point("scrape")
+    workflow.add_edge("scrape", "select")
+    workflow.add_edge("select", "budget")
+    if mode == "single_pass":
+        workflow.add_node("respond", single_pass_node)
+        workflow.add_edge("budget", "respond")
+    else:
+        workflow.add_node("analyze", analyst_node)
+        workflow.add_node("respond", responder_node)
+        workflow.add_edge("budget", "analyze")
+        workflow.add_edge("analyze", "respond")
+    workflow.add_edge("respond", END)
+    return workflow.compile()
@@ -0,0 +1,121 @@
+import os
+import time
+import asyncio
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+import httpx
+
+from .pages import process_html
+from .state import ScrapedPage
+
+# Shared HTTP client for the scraper, kept alive for the whole process so
+# repeated queries reuse pooled TCP/TLS connections to the frontend host
+# HTTP/2 is opt-in and needs the optional extra: pip install "httpx[http2]"
+SCRAPER_HTTP2 = os.getenv("SCRAPER_HTTP2", "false").lower() in ("1", "true", "yes")
+SCRAPER_MAX_CONNECTIONS = int(os.getenv("SCRAPER_MAX_CONNECTIONS", "20"))
+SCRAPER_MAX_KEEPALIVE = int(os.getenv("SCRAPER_MAX_KEEPALIVE", "10"))
+SCRAPER_KEEPALIVE_EXPIRY = float(os.getenv("SCRAPER_KEEPALIVE_EXPIRY", "60"))
+
+http_client: Optional[httpx.AsyncClient] = None
+
+def create_http_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        follow_redirects=True,
+        http2=SCRAPER_HTTP2,
+        timeout=10.0,
+        limits=httpx.Limits(
+            max_connections=SCRAPER_MAX_CONNECTIONS,
+            max_keepalive_connections=SCRAPER_MAX_KEEPALIVE,
+            keepalive_expiry=SCRAPER_KEEPALIVE_EXPIRY,
+        ),
+    )
+
+# Returns the shared client, creating it lazily if the lifespan hook did not run
+# (e.g. serverless runtimes that skip ASGI lifespan events)
+def get_http_client() -> httpx.AsyncClient:
+    global http_client
+    if http_client is None or http_client.is_closed:
+        http_client = create_http_client()
+    return http_client
+
+async def close_http_client():
+    global http_client
+    if http_client is not None:
+        await http_client.aclose()
+        http_client = None
+
+# Max number of pages fetched at the same time by the scraper
+SCRAPE_CONCURRENCY = max(1, int(os.getenv("SCRAPE_CONCURRENCY", "4")))
+
+# Cleaned pages keyed by URL. Entries are served as-is for PAGE_CACHE_TTL seconds,
+# then revalidated with If-None-Match / If-Modified-Since so an unchanged page
+# costs a 304 instead of a full download and re-parse. The API's snapshot refresher
+# always revalidates (max_age=0) on its own schedule, so PAGE_CACHE_TTL only
+# applies to other callers of scrape_pages, such as the CLI snapshot builder
+PAGE_CACHE_TTL = float(os.getenv("PAGE_CACHE_TTL", "300"))
+
+@dataclass
+class CachedPage:
+    text: str
+    ui_map: dict
+    raw_hash: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    fetched_at: float
+
+page_cache: Dict[str, CachedPage] = {}
+
+def cached_result(url: str, cached: CachedPage) -> ScrapedPage:
+    return ScrapedPage(url, f"\n--- Content from {url} ---\n{cached.text}\n", cached.ui_map, cached.raw_hash)
+
+# Fetch a single page and return its cleaned text block and UI map. A cached
+# copy younger than max_age is served without a request; max_age=0 always
+# revalidates
+async def fetch_page(client: httpx.AsyncClient, url: str, max_age: float = PAGE_CACHE_TTL) -> ScrapedPage:
+    cached = page_cache.get(url)
+    now = time.monotonic()
+    if cached and now - cached.fetched_at < max_age:
+        return cached_result(url, cached)
+    
+    headers = {}
+    if cached and cached.etag:
+        headers["If-None-Match"] = cached.etag
+    if cached and cached.last_modified:
+        headers["If-Modified-Since"] = cached.last_modified
+    
+    try:
+        response = await client.get(url, headers=headers, timeout=10.0)
+        if response.status_code == 304 and cached:
+            cached.fetched_at = now
+            return cached_result(url, cached)
+        if response.status_code == 200:
+            # Only re-cleaned when the HTML differs from the last copy seen
+            processed = process_html(url, response.text)
+            cached = CachedPage(
+                text=processed.text,
+                ui_map=processed.ui_map,
+                raw_hash=processed.raw_hash,
+                etag=response.headers.get("etag"),
+                last_modified=response.headers.get("last-modified"),
+                fetched_at=now,
+            )
+            page_cache[url] = cached
+            return cached_result(url, cached)
+        return ScrapedPage(url, f"\n--- Failed to scrape {url} (Status: {response.status_code}) ---\n")
+    except Exception as e:
+        # Serve the last good copy rather than nothing if revalidation fails
+        if cached:
+            return cached_result(url, cached)
+        return ScrapedPage(url, f"\n--- Error scraping {url}: {str(e)} ---\n")
+
+# Fetch and clean every URL concurrently, one page per URL in input order
+async def scrape_pages(urls: List[str], client: Optional[httpx.AsyncClient] = None, max_age: float = PAGE_CACHE_TTL) -> List[ScrapedPage]:
+    semaphore = asyncio.Semaphore(SCRAPE_CONCURRENCY)
+    
+    async def bounded_fetch(client: httpx.AsyncClient, url: str) -> ScrapedPage:
+        async with semaphore:
+            return await fetch_page(client, url, max_age)
+    
+    client = client or get_http_client()
+    # gather() keeps results in the same order as `urls`
+    return list(await asyncio.gather(*(bounded_fetch(client, url) for url in urls)))
@@ -0,0 +1,24 @@
+import os
+from typing import Dict
+from langchain_groq import ChatGroq
+
+from .tokens import count_tokens
+
+# Initialize Groq LLM
+llm = ChatGroq(
+    temperature=0,
+    model_name="llama-3.3-70b-versatile",
+    groq_api_key=os.getenv("GROQ_API_KEY")
+)
+
+# Process-wide token totals per graph node (served at /api/metrics/tokens by the API)
+token_metrics: Dict[str, Dict[str, int]] = {}
+
+# Call the LLM and record the prompt and completion tokens against the node
+async def invoke_llm(node: str, messages: list):
+    response = await llm.ainvoke(messages)
+    metrics = token_metrics.setdefault(node, {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0})
+    metrics["calls"] += 1
+    metrics["prompt_tokens"] += sum(count_tokens(message.content) for message in messages)
+    metrics["completion_tokens"] += count_tokens(response.content)
+    return response
@@ -0,0 +1,28 @@
+import hashlib
+from dataclasses import dataclass
+from typing import Dict
+
+from .ui_map import clean_page
+
+# Cleaned text and UI map of the last HTML seen for each URL, tagged with the
+# hash of that HTML. A re-scrape that gets byte-identical markup (a revalidation
+# after the page TTL, a re-render of an unchanged page) reuses them instead of
+# parsing the page again, so only pages that actually changed are re-cleaned
+@dataclass
+class ProcessedPage:
+    raw_hash: str
+    text: str
+    ui_map: dict
+
+processed_pages: Dict[str, ProcessedPage] = {}
+
+def hash_text(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def process_html(url: str, html: str) -> ProcessedPage:
+    raw_hash = hash_text(html)
+    processed = processed_pages.get(url)
+    if processed is None or processed.raw_hash != raw_hash:
+        processed = ProcessedPage(raw_hash, *clean_page(url, html))
+        processed_pages[url] = processed
+    return processed
@@ -0,0 +1,148 @@
+import os
+import re
+import math
+import hashlib
+from collections import Counter, OrderedDict
+from typing import List, Optional, Tuple
+
+from .tokens import count_tokens
+
+# Query-relevant content selection. The scraped pages are split into chunks of
+# about CHUNK_WORDS words, indexed with BM25 once per distinct content, and only
+# the top RETRIEVAL_TOP_K chunks that fit in CONTEXT_TOKEN_BUDGET are sent to the
+# LLM. CONTENT_SELECTION=full sends the whole scrape instead
+CONTENT_SELECTION = os.getenv("CONTENT_SELECTION", "bm25")
+CHUNK_WORDS = int(os.getenv("CHUNK_WORDS", "120"))
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "8"))
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+
+def tokenize(text: str) -> List[str]:
+    return re.findall(r"\w+", text.lower())
+
+# Split each page block into chunks that keep the page's header line
+def chunk_content(scraped_content: str) -> List[str]:
+    chunks = []
+    header = ""
+    lines: List[str] = []
+    words = 0
+    
+    def flush():
+        if lines:
+            chunks.append("\n".join([header] + lines if header else lines))
+    
+    for line in scraped_content.splitlines():
+        if not line.strip():
+            continue
+        if line.startswith("--- Content from "):
+            flush()
+            header, lines, words = line, [], 0
+            continue
+        if words and words + len(line.split()) > CHUNK_WORDS:
+            flush()
+            lines, words = [], 0
+        lines.append(line)
+        words += len(line.split())
+    flush()
+    return chunks
+
+class BM25Index:
+    def __init__(self, chunks: List[str], k1: float = 1.5, b: float = 0.75, term_freqs: Optional[List[Counter]] = None):
+        self.chunks = chunks
+        self.k1 = k1
+        self.b = b
+        self.term_freqs = term_freqs if term_freqs is not None else [Counter(tokenize(chunk)) for chunk in chunks]
+        self.lengths = [sum(tf.values()) for tf in self.term_freqs]
+        self.avg_length = sum(self.lengths) / len(self.lengths) if self.lengths else 0.0
+        doc_freq = Counter(term for tf in self.term_freqs for term in tf)
+        n = len(chunks)
+        self.idf = {term: math.log(1 + (n - df + 0.5) / (df + 0.5)) for term, df in doc_freq.items()}
+    
+    def scores(self, query: str) -> List[float]:
+        terms = [term for term in set(tokenize(query)) if term in self.idf]
+        scores = []
+        for tf, length in zip(self.term_freqs, self.lengths):
+            norm = self.k1 * (1 - self.b + self.b * length / self.avg_length) if self.avg_length else self.k1
+            scores.append(sum(self.idf[t] * tf[t] * (self.k1 + 1) / (tf[t] + norm) for t in terms if t in tf))
+        return scores
+
+# Chunks and term counts per page block, keyed by a hash of the block. When a
+# refresh changes one page, only that page is re-chunked and re-tokenized; the
+# BM25 statistics are then rebuilt from the cached counts
+PAGE_CHUNK_CACHE_SIZE = 64
+page_chunks: "OrderedDict[str, Tuple[List[str], List[Counter]]]" = OrderedDict()
+
+# Split the scraped content before each page header
+def split_pages(scraped_content: str) -> List[str]:
+    return re.split(r"(?m)^(?=--- Content from )", scraped_content)
+
+def get_page_chunks(block: str) -> Tuple[List[str], List[Counter]]:
+    key = hashlib.sha1(block.encode("utf-8")).hexdigest()
+    entry = page_chunks.get(key)
+    if entry is None:
+        chunks = chunk_content(block)
+        entry = (chunks, [Counter(tokenize(chunk)) for chunk in chunks])
+        page_chunks[key] = entry
+        while len(page_chunks) > PAGE_CHUNK_CACHE_SIZE:
+            page_chunks.popitem(last=False)
+    page_chunks.move_to_end(key)
+    return entry
+
+# Indexes keyed by a hash of the scraped content, so each snapshot is indexed once
+chunk_indexes: "OrderedDict[str, BM25Index]" = OrderedDict()
+
+def get_chunk_index(scraped_content: str) -> BM25Index:
+    key = hashlib.sha1(scraped_content.encode("utf-8")).hexdigest()
+    index = chunk_indexes.get(key)
+    if index is None:
+        chunks: List[str] = []
+        term_freqs: List[Counter] = []
+        for block in split_pages(scraped_content):
+            block_chunks, block_term_freqs = get_page_chunks(block)
+            chunks += block_chunks
+            term_freqs += block_term_freqs
+        index = BM25Index(chunks, term_freqs=term_freqs)
+        chunk_indexes[key] = index
+        while len(chunk_indexes) > 4:
+            chunk_indexes.popitem(last=False)
+    chunk_indexes.move_to_end(key)
+    return index
+
+def select_context(query: str, scraped_content: str, budget: int = CONTEXT_TOKEN_BUDGET) -> str:
+    index = get_chunk_index(scraped_content)
+    scores = index.scores(query)
+    ranked = sorted(range(len(index.chunks)), key=lambda i: scores[i], reverse=True)
+    # Nothing matched: keep the pages in their original order instead
+    if not any(scores):
+        ranked = list(range(len(index.chunks)))
+    
+    selected = []
+    used = 0
+    for i in ranked:
+        if len(selected) >= RETRIEVAL_TOP_K:
+            break
+        cost = count_tokens(index.chunks[i])
+        if used + cost > budget:
+            continue
+        selected.append(i)
+        used += cost
+    
+    # Present the chosen chunks in page order
+    return "\n\n".join(index.chunks[i] for i in sorted(selected))
+
+# Hard cap on the content placed in a prompt, whatever the selection mode
+MAX_CONTEXT_TOKENS = int(os.getenv("MAX_CONTEXT_TOKENS", "6000"))
+
+# Keep whole lines from the top until the budget is spent
+def truncate_to_tokens(text: str, budget: int) -> str:
+    if count_tokens(text) <= budget:
+        return text
+    kept = []
+    used = 0
+    for line in text.splitlines():
+        cost = count_tokens(line) + 1
+        if used + cost > budget:
+            break
+        kept.append(line)
+        used += cost
+    kept.append("[... content truncated to fit the token budget ...]")
+    return "\n".join(kept)
@@ -0,0 +1,241 @@
+import os
+import sys
+import json
+import asyncio
+import time
+import hashlib
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from .state import ScrapedPage, page_hashes
+
+# Pre-built knowledge snapshot (written by build_snapshot.py). When present, the
+# API's scrape node reads page content from memory instead of hitting the network
+SNAPSHOT_PATH = os.getenv("SNAPSHOT_PATH", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "api", "snapshot.json"))
+SNAPSHOT_FORMAT = 4
+
+def load_snapshot(path: str) -> Optional[dict]:
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if data.get("format") != SNAPSHOT_FORMAT:
+        return None
+    return add_page_map(data)
+
+# In-memory index of the snapshot pages by URL
+def add_page_map(data: dict) -> dict:
+    data["page_map"] = {
+        page["url"]: ScrapedPage(page["url"], page["content"], page["ui_map"], page["raw_hash"])
+        for page in data["pages"]
+    }
+    return data
+
+# Scrape the target pages once with the httpx scraper
+def scrape_with_httpx(urls: List[str]) -> List[ScrapedPage]:
+    from .http_scraper import create_http_client, scrape_pages
+    
+    async def run():
+        async with create_http_client() as client:
+            return await scrape_pages(urls, client)
+    return asyncio.run(run())
+
+# Scrape the target pages once with the Playwright scraper
+def scrape_with_playwright(urls: List[str]) -> List[ScrapedPage]:
+    from .browser_scraper import close_browser_pool, scrape_pages
+    try:
+        return scrape_pages(urls)
+    finally:
+        close_browser_pool()
+
+# Scrape the target pages once with the concurrent async Playwright scraper
+def scrape_with_async_playwright(urls: List[str]) -> List[ScrapedPage]:
+    from .async_browser_scraper import close_async_browser_pool, scrape_pages
+    
+    async def run():
+        try:
+            return await scrape_pages(urls)
+        finally:
+            await close_async_browser_pool()
+    return asyncio.run(run())
+
+SNAPSHOT_BACKENDS = {
+    "httpx": scrape_with_httpx,
+    "playwright": scrape_with_playwright,
+    "playwright-async": scrape_with_async_playwright,
+}
+
+def scraped_ok(page: ScrapedPage) -> bool:
+    return page.content.startswith(f"\n--- Content from {page.url} ---")
+
+def build_snapshot(urls: List[str], backend: str) -> dict:
+    scraped = SNAPSHOT_BACKENDS[backend](urls)
+
+    failed = [page.url for page in scraped if not scraped_ok(page)]
+    if failed:
+        raise RuntimeError("Failed to scrape: " + ", ".join(failed))
+
+    return snapshot_from_pages(scraped, backend)
+
+def snapshot_from_pages(scraped: List[ScrapedPage], backend: str) -> dict:
+    pages = [
+        {
+            "url": page.url,
+            "content": page.content,
+            "ui_map": page.ui_map,
+            "raw_hash": page.raw_hash,
+            "content_hash": page.content_hash,
+            "ui_map_hash": page.ui_map_hash,
+        }
+        for page in scraped
+    ]
+    # The version changes only when the content of some page does
+    digest = hashlib.sha256(json.dumps(page_hashes(scraped), sort_keys=True).encode("utf-8")).hexdigest()
+
+    return {
+        "format": SNAPSHOT_FORMAT,
+        "version": digest[:12],
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "backend": backend,
+        "pages": pages,
+    }
+
+# URLs whose content differs between two snapshots (added and removed pages included)
+def changed_pages(old: Optional[dict], new: dict) -> List[str]:
+    old_hashes = {page["url"]: (page["content_hash"], page["ui_map_hash"]) for page in old["pages"]} if old else {}
+    new_hashes = {page["url"]: (page["content_hash"], page["ui_map_hash"]) for page in new["pages"]}
+    return [url for url in dict.fromkeys(list(new_hashes) + list(old_hashes)) if old_hashes.get(url) != new_hashes.get(url)]
+
+# Background refresh with stale-while-revalidate semantics. Requests are always
+# answered from the snapshot in memory (the snapshot file, or the last refresh)
+# while a background task re-scrapes the pages every SNAPSHOT_REFRESH_INTERVAL
+# seconds with the backend the current snapshot was built with (httpx when
+# there is none yet), so a Playwright snapshot is never replaced by the httpx
+# view of the SPA shell. A snapshot loaded from disk is served for one interval
+# before its first refresh. The new snapshot is swapped in only when some page
+# changed, and a page that fails to scrape keeps its last good copy. The only
+# request that waits on a scrape is one that arrives before any content exists.
+# SNAPSHOT_REFRESH_INTERVAL=0 turns refreshing off
+SNAPSHOT_REFRESH_INTERVAL = float(os.getenv("SNAPSHOT_REFRESH_INTERVAL", "300"))
+
+current_snapshot: Optional[dict] = None
+# When the current snapshot was last confirmed up to date (time.monotonic())
+snapshot_checked_at = 0.0
+refresh_task: Optional[asyncio.Task] = None
+snapshot_refresher: Optional[asyncio.Task] = None
+
+# data must come from load_snapshot or add_page_map
+def set_current_snapshot(data: Optional[dict]):
+    global current_snapshot, snapshot_checked_at
+    current_snapshot = data
+    snapshot_checked_at = time.monotonic()
+
+def get_current_snapshot() -> Optional[dict]:
+    return current_snapshot
+
+# Content hash of every page in the current snapshot
+def current_page_hashes() -> Dict[str, str]:
+    if current_snapshot is None:
+        return {}
+    return page_hashes(list(current_snapshot["page_map"].values()))
+
+# Async counterparts of SNAPSHOT_BACKENDS for use on the API's event loop
+async def refresh_with_httpx(urls: List[str]) -> List[ScrapedPage]:
+    from .http_scraper import scrape_pages
+    # max_age=0: every page is revalidated, unchanged ones cost a 304
+    return await scrape_pages(urls, max_age=0)
+
+async def refresh_with_playwright(urls: List[str]) -> List[ScrapedPage]:
+    from .browser_scraper import scrape_pages
+    return await asyncio.to_thread(scrape_pages, urls)
+
+async def refresh_with_async_playwright(urls: List[str]) -> List[ScrapedPage]:
+    from .async_browser_scraper import scrape_pages
+    return await scrape_pages(urls)
+
+REFRESH_BACKENDS = {
+    "httpx": refresh_with_httpx,
+    "playwright": refresh_with_playwright,
+    "playwright-async": refresh_with_async_playwright,
+}
+
+def refresh_backend() -> str:
+    return current_snapshot.get("backend", "httpx") if current_snapshot else "httpx"
+
+async def rescrape_snapshot(urls: List[str]) -> List[str]:
+    backend = refresh_backend()
+    scraped = await REFRESH_BACKENDS[backend](urls)
+    previous = current_snapshot
+    if previous is not None:
+        scraped = [
+            page if scraped_ok(page) or page.url not in previous["page_map"] else previous["page_map"][page.url]
+            for page in scraped
+        ]
+    
+    data = add_page_map(snapshot_from_pages(scraped, backend))
+    changed = changed_pages(previous, data)
+    if changed:
+        set_current_snapshot(data)
+    else:
+        global snapshot_checked_at
+        snapshot_checked_at = time.monotonic()
+    return changed
+
+# Re-scrape now and return the URLs that changed. Concurrent callers share one
+# in-flight refresh
+async def refresh_snapshot(urls: List[str]) -> List[str]:
+    global refresh_task
+    if refresh_task is None or refresh_task.done():
+        refresh_task = asyncio.ensure_future(rescrape_snapshot(urls))
+    return await asyncio.shield(refresh_task)
+
+# Start a refresh without waiting for it, unless one is already running
+def schedule_snapshot_refresh(urls: List[str]):
+    global refresh_task
+    if refresh_task is None or refresh_task.done():
+        refresh_task = asyncio.ensure_future(rescrape_snapshot(urls))
+        # Failures are retried on the next schedule; don't leave them unretrieved
+        refresh_task.add_done_callback(lambda task: task.cancelled() or task.exception())
+
+def snapshot_is_stale() -> bool:
+    return SNAPSHOT_REFRESH_INTERVAL > 0 and time.monotonic() - snapshot_checked_at >= SNAPSHOT_REFRESH_INTERVAL
+
+async def snapshot_refresh_loop(urls: List[str]):
+    # Content already loaded (e.g. the snapshot file): serve it for one interval first
+    if current_snapshot is not None:
+        await asyncio.sleep(SNAPSHOT_REFRESH_INTERVAL)
+    while True:
+        try:
+            await refresh_snapshot(urls)
+        except Exception:
+            # Keep serving the current snapshot and try again next interval
+            pass
+        await asyncio.sleep(SNAPSHOT_REFRESH_INTERVAL)
+
+# Start the refresher on the running loop if it isn't already running
+def ensure_snapshot_refresher(urls: List[str]):
+    global snapshot_refresher
+    if SNAPSHOT_REFRESH_INTERVAL <= 0:
+        return
+    if snapshot_refresher is None or snapshot_refresher.done():
+        snapshot_refresher = asyncio.create_task(snapshot_refresh_loop(urls))
+
+async def stop_snapshot_refresher():
+    global snapshot_refresher, refresh_task
+    for task in (snapshot_refresher, refresh_task):
+        if task is not None and not task.done():
+            task.cancel()
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass
+    snapshot_refresher = None
+    refresh_task = None
+    
+    # Browsers started by Playwright refreshes
+    if "assistant.browser_scraper" in sys.modules:
+        from .browser_scraper import close_browser_pool
+        await asyncio.to_thread(close_browser_pool)
+    if "assistant.async_browser_scraper" in sys.modules:
+        from .async_browser_scraper import close_async_browser_pool
+        await close_async_browser_pool()
@@ -0,0 +1,97 @@
+import re
+import json
+import hashlib
+from dataclasses import dataclass, field
+from typing import Dict, TypedDict, List, Optional
+
+# Define the state for the graph
+class AgentState(TypedDict):
+    query: str
+    urls: List[str]
+    scraped_content: str
+    context: str
+    ui_maps: List[dict]
+    page_hashes: Dict[str, str]
+    analysis: str
+    final_response: str
+    validation_status: str
+    query_type: str
+    email: Optional[str]
+
+# Frontend pages the assistant learns the UI from
+TARGET_URLS = [
+    "https://attendance-management-system-fronte-two.vercel.app/teacher/dashboard",
+    "https://attendance-management-system-fronte-two.vercel.app/teacher/subject",
+    "https://attendance-management-system-fronte-two.vercel.app/teacher/attendance",
+    "https://attendance-management-system-fronte-two.vercel.app/teacher/attendance-report"
+]
+
+def initial_state(query: str, urls: List[str], email: Optional[str] = None) -> AgentState:
+    return {
+        "query": query,
+        "urls": urls,
+        "scraped_content": "",
+        "context": "",
+        "ui_maps": [],
+        "page_hashes": {},
+        "analysis": "",
+        "final_response": "",
+        "validation_status": "",
+        "query_type": "",
+        "email": email
+    }
+
+def short_hash(value) -> str:
+    payload = json.dumps(value, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+# One scraped page: the text block fed to the graph plus its UI map (None when
+# the scrape failed). raw_hash identifies the HTML it was built from, while
+# content_hash and ui_map_hash cover what the graph sees of the text and of the
+# UI map, so refreshes can tell which part of which page changed
+@dataclass
+class ScrapedPage:
+    url: str
+    content: str
+    ui_map: Optional[dict] = None
+    raw_hash: str = ""
+    content_hash: str = field(init=False)
+    ui_map_hash: str = field(init=False)
+    
+    def __post_init__(self):
+        self.content_hash = short_hash(self.content)
+        self.ui_map_hash = short_hash(self.ui_map)
+
+# Answer dependencies are keyed by URL for the page text and by this key for
+# the page's UI map, since either can reach the prompt without the other
+def ui_map_key(url: str) -> str:
+    return f"{url}#ui-map"
+
+def page_hashes(pages: List[ScrapedPage]) -> Dict[str, str]:
+    hashes = {}
+    for page in pages:
+        hashes[page.url] = page.content_hash
+        hashes[ui_map_key(page.url)] = page.ui_map_hash
+    return hashes
+
+# Graph update for the scrape node
+def scraped_update(pages: List[ScrapedPage]) -> dict:
+    return {
+        "scraped_content": "".join(page.content for page in pages),
+        "ui_maps": [page.ui_map for page in pages if page.ui_map],
+        "page_hashes": page_hashes(pages),
+    }
+
+CONTENT_HEADER = re.compile(r"^--- Content from (\S+) ---$", re.MULTILINE)
+
+# What an answer was built from: the pages with text left in the final context
+# (after selection and the token budget), the UI maps that fit in the prompt,
+# and the pages that failed to scrape, so an answer built without a page is
+# invalidated once that page recovers. A change to any other page keeps it
+def pages_used(state: dict) -> List[str]:
+    hashes = state.get("page_hashes") or {}
+    scraped = set(CONTENT_HEADER.findall(state.get("scraped_content") or ""))
+    in_context = CONTENT_HEADER.findall(state.get("context") or "")
+    ui_maps = [ui_map_key(ui_map["url"]) for ui_map in state.get("ui_maps") or []]
+    failed = [url for url in state.get("urls") or [] if url in hashes and url not in scraped]
+    return list(dict.fromkeys(in_context + ui_maps + failed))
@@ -0,0 +1,9 @@
+import re
+
+# Local token counter. Approximates the model's BPE tokenizer without
+# downloading it: one token per punctuation mark, and one per word plus one
+# for every further 6 characters of long words
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+def count_tokens(text: str) -> int:
+    return sum(1 + (len(piece) - 1) // 6 for piece in TOKEN_PATTERN.findall(text))
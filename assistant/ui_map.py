@@ -0,0 +1,173 @@
+import os
+from typing import List, Optional, Tuple
+from urllib.parse import urljoin, urlparse
+
+from .cleaner import clean_html_and_inspect
+from .tokens import count_tokens
+
+# Structured UI map per page: headings, buttons, links with their targets and
+# form fields. It is built once at scrape time (from the httpx HTML or the
+# rendered Playwright DOM), stored in the snapshot next to the page text and
+# rendered compactly for the analyst, so button labels and navigation paths
+# don't have to be rediscovered from flat text on every query
+UI_MAP_TOKEN_BUDGET = int(os.getenv("UI_MAP_TOKEN_BUDGET", "800"))
+UI_MAP_MAX_ITEMS = int(os.getenv("UI_MAP_MAX_ITEMS", "40"))
+
+# Read after the cleaner's noise tags are gone but before nav/header/footer
+# are stripped for the text: that is where the navigation links live
+BUTTON_SELECTOR = "button, [role='button'], input[type='submit'], input[type='button']"
+FIELD_SELECTOR = "input, select, textarea"
+SKIPPED_INPUT_TYPES = {"hidden", "submit", "button", "reset", "image"}
+
+# Read-only views over the two cleaner trees, so one builder serves both
+class SoupTree:
+    def __init__(self, soup):
+        self.soup = soup
+    
+    def select(self, css: str) -> list:
+        return self.soup.select(css)
+    
+    def name(self, node) -> str:
+        return node.name
+    
+    def attr(self, node, name: str) -> str:
+        value = node.get(name)
+        return value.strip() if isinstance(value, str) else ""
+    
+    def text(self, node) -> str:
+        return " ".join(node.get_text(separator=" ").split())
+    
+    def parent_label(self, node):
+        return node.find_parent("label")
+
+class LexborTree:
+    def __init__(self, tree):
+        self.tree = tree
+    
+    def select(self, css: str) -> list:
+        return self.tree.css(css)
+    
+    def name(self, node) -> str:
+        return node.tag
+    
+    def attr(self, node, name: str) -> str:
+        return (node.attributes.get(name) or "").strip()
+    
+    def text(self, node) -> str:
+        return " ".join(node.text(separator=" ").split())
+    
+    def parent_label(self, node):
+        parent = node.parent
+        while parent is not None and parent.tag != "label":
+            parent = parent.parent
+        return parent
+
+TREE_VIEWS = {"bs4": SoupTree, "lexbor": LexborTree}
+
+def unique(items: list) -> list:
+    seen = []
+    for item in items:
+        if item and item not in seen:
+            seen.append(item)
+    return seen[:UI_MAP_MAX_ITEMS]
+
+# Same-site links become paths (/teacher/subject), external links stay absolute
+def link_target(page_url: str, href: str) -> Optional[str]:
+    href = href.strip()
+    if not href or href.startswith(("#", "javascript:", "mailto:", "tel:")):
+        return None
+    target = urlparse(urljoin(page_url, href))
+    if target.netloc == urlparse(page_url).netloc:
+        return target.path + (f"?{target.query}" if target.query else "")
+    return target.geturl()
+
+def field_label(tree, field, labels_for: dict) -> str:
+    if tree.attr(field, "aria-label"):
+        return tree.attr(field, "aria-label")
+    if labels_for.get(tree.attr(field, "id")):
+        return labels_for[tree.attr(field, "id")]
+    parent = tree.parent_label(field)
+    if parent is not None and tree.text(parent):
+        return tree.text(parent)
+    return tree.attr(field, "placeholder") or tree.attr(field, "name")
+
+def build_ui_map(url: str, tree) -> dict:
+    labels_for = {}
+    for label in tree.select("label[for]"):
+        labels_for.setdefault(tree.attr(label, "for"), tree.text(label))
+
+    headings = unique([
+        {"level": int(tree.name(node)[1]), "text": tree.text(node)}
+        for node in tree.select("h1, h2, h3, h4")
+        if tree.text(node)
+    ])
+
+    buttons = unique([
+        tree.text(node) or tree.attr(node, "value") or tree.attr(node, "aria-label")
+        for node in tree.select(BUTTON_SELECTOR)
+    ])
+
+    links = []
+    for node in tree.select("a[href]"):
+        target = link_target(url, tree.attr(node, "href"))
+        text = tree.text(node) or tree.attr(node, "aria-label")
+        if target and text:
+            links.append({"text": text, "target": target})
+
+    fields = []
+    for node in tree.select(FIELD_SELECTOR):
+        field_type = tree.name(node) if tree.name(node) != "input" else (tree.attr(node, "type") or "text").lower()
+        if field_type in SKIPPED_INPUT_TYPES:
+            continue
+        label = field_label(tree, node, labels_for)
+        if label:
+            fields.append({"label": label, "type": field_type})
+
+    titles = tree.select("title")
+    return {
+        "url": url,
+        "title": tree.text(titles[0]) if titles else "",
+        "headings": headings,
+        "buttons": buttons,
+        "links": unique(links),
+        "fields": unique(fields),
+    }
+
+# Cleaned text and UI map of a page from a single parse with CLEANER_BACKEND
+def clean_page(url: str, html: str) -> Tuple[str, dict]:
+    return clean_html_and_inspect(html, lambda tree, kind: build_ui_map(url, TREE_VIEWS[kind](tree)))
+
+# One short paragraph per page, e.g.
+#   [/teacher/subject] Subjects
+#     Headings: Subjects > Add a subject
+#     Buttons: Add Subject, Save
+#     Links: Dashboard -> /teacher/dashboard
+#     Fields: Subject name (text), Semester (select)
+def render_ui_map(ui_map: dict) -> str:
+    path = urlparse(ui_map["url"]).path or ui_map["url"]
+    lines = [f"[{path}] {ui_map['title']}".rstrip()]
+    if ui_map["headings"]:
+        lines.append("  Headings: " + " > ".join(h["text"] for h in ui_map["headings"]))
+    if ui_map["buttons"]:
+        lines.append("  Buttons: " + ", ".join(ui_map["buttons"]))
+    if ui_map["links"]:
+        lines.append("  Links: " + ", ".join(f"{link['text']} -> {link['target']}" for link in ui_map["links"]))
+    if ui_map["fields"]:
+        lines.append("  Fields: " + ", ".join(f"{field['label']} ({field['type']})" for field in ui_map["fields"]))
+    return "\n".join(lines)
+
+def render_ui_maps(ui_maps: List[dict]) -> str:
+    return "\n".join(render_ui_map(ui_map) for ui_map in ui_maps)
+
+# Whole UI maps, in page order, that fit in UI_MAP_TOKEN_BUDGET. Maps that don't
+# fit are left out rather than cut mid-page
+def fit_ui_maps(ui_maps: List[dict], budget: int = UI_MAP_TOKEN_BUDGET) -> List[dict]:
+    fitted = []
+    used = 0
+    for ui_map in ui_maps:
+        cost = count_tokens(render_ui_map(ui_map)) + 1
+        if used + cost > budget:
+            continue
+        fitted.append(ui_map)
+        used += cost
+    return fitted
@@ -0,0 +1,36 @@
+import argparse
+import json
+import os
+import sys
+
+from assistant.snapshot import SNAPSHOT_BACKENDS, SNAPSHOT_PATH, build_snapshot, changed_pages, load_snapshot
+from assistant.state import TARGET_URLS
+
+def main():
+    parser = argparse.ArgumentParser(description="Scrape the frontend pages once and write a knowledge snapshot for the API.")
+    parser.add_argument("--backend", choices=sorted(SNAPSHOT_BACKENDS), default="httpx")
+    parser.add_argument("--output", default=SNAPSHOT_PATH)
+    args = parser.parse_args()
+
+    try:
+        data = build_snapshot(TARGET_URLS, args.backend)
+    except RuntimeError as e:
+        print(str(e), file=sys.stderr)
+        sys.exit(1)
+
+    previous = load_snapshot(args.output)
+    changed = changed_pages(previous, data)
+    if previous and not changed:
+        print(f"Snapshot {previous['version']} is up to date, nothing changed")
+        return
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+
+    print(f"Wrote snapshot {data['version']} ({len(data['pages'])} pages, {len(changed)} changed) to {args.output}")
+    for url in changed:
+        print(f"  changed: {url}")
+
+if __name__ == "__main__":
+    main()